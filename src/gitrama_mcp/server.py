@@ -14,12 +14,21 @@ Transport: stdio (default) or streamable-http
 """
 
 import asyncio
+import contextlib
+import hashlib
+import json
 import os
+import subprocess
 import sys
-from typing import Optional
+import threading
+import time
+from typing import TYPE_CHECKING, Awaitable, Optional, Sequence
 
 from mcp.server.fastmcp import FastMCP
 
+if TYPE_CHECKING:
+    import sqlite3
+
 # ---------------------------------------------------------------------------
 # Module version
 # ---------------------------------------------------------------------------
@@ -40,28 +49,222 @@ mcp = FastMCP(
     ),
 )
 
+# @mcp.tool() builds each tool's argument model and JSON schema when the
+# function is decorated, so every schema below is ready once this module has
+# imported — the first call to a tool pays no signature/docstring parsing.
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 
+# Resolved working directory, and the GTR_CWD value it was resolved from.
+_CACHED_CWD: Optional[str] = None
+_CACHED_GTR_CWD: Optional[str] = None
+
+
 def _get_cwd() -> str:
-    """Return the working directory — prefer GTR_CWD env var, then os.getcwd()."""
-    return os.environ.get("GTR_CWD", os.getcwd())
+    """
+    Return the working directory — prefer GTR_CWD env var, then os.getcwd().
+
+    The server's directory is fixed for the life of the process, so the
+    result is cached and only re-resolved when GTR_CWD changes.
+    """
+    global _CACHED_CWD, _CACHED_GTR_CWD
+    env_cwd = os.environ.get("GTR_CWD")
+    if _CACHED_CWD is None or env_cwd != _CACHED_GTR_CWD:
+        _CACHED_CWD = env_cwd or os.getcwd()
+        _CACHED_GTR_CWD = env_cwd
+    return _CACHED_CWD
+
+
+# Side-effect-free gtr subcommands (matched on leading argv tokens) whose
+# results can be reused for a short while → default TTL in seconds.
+# `status` is deliberately absent: it reports the working tree, which the
+# client's own file-edit tools change without going through this server.
+_READONLY_CMDS: dict[tuple[str, ...], float] = {
+    ("stream", "status"): 5.0,
+    ("stream", "list"): 5.0,
+    ("health",): 60.0,
+}
+
+
+def _parse_cache_ttl(raw: Optional[str]) -> Optional[float]:
+    """Parse GTR_MCP_CACHE_TTL; None (use the defaults) if unset or invalid."""
+    if not raw:
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        print(
+            f"Ignoring invalid GTR_MCP_CACHE_TTL={raw!r} (expected seconds).",
+            file=sys.stderr,
+        )
+        return None
+
+
+# GTR_MCP_CACHE_TTL overrides every TTL above; set it to 0 to disable caching.
+_CACHE_TTL_OVERRIDE = _parse_cache_ttl(os.environ.get("GTR_MCP_CACHE_TTL"))
+
+# (args, work_dir) → (monotonic timestamp, result dict)
+_cache: dict[tuple, tuple[float, dict]] = {}
+
+# Bumped by _invalidate_cache() so a read that started before a mutation
+# doesn't store its (now stale) result afterwards.
+_cache_generation = 0
+
+# Idempotent gtr subcommands for which concurrent identical calls share a
+# single run. Includes the LLM-backed `ask` and `pr`, where a duplicate
+# call costs an extra API request rather than just a process.
+_COALESCE_CMDS: set[tuple[str, ...]] = {("ask",), ("pr",), *_READONLY_CMDS}
+
+# (args, work_dir) → task running that command right now
+_inflight: dict[tuple, asyncio.Task] = {}
+
+# Cap how many subprocesses run at once so a burst of concurrent tool calls
+# queues up instead of forking a process each. Most of a gtr call's time is
+# spent waiting on the AI API rather than on CPU, so small hosts still get
+# a few slots. Plain git commands are quick and local, so they get their own
+# pool rather than queueing behind minutes-long gtr reviews and scans.
+_spawn_slots = asyncio.Semaphore(max(4, min(os.cpu_count() or 1, 8)))
+_git_slots = asyncio.Semaphore(max(4, min(os.cpu_count() or 1, 8)))
+
+
+def _cache_ttl(args: Sequence[str]) -> float:
+    """Return how long a result of `gtr <args>` may be reused (0 = never)."""
+    for prefix, ttl in _READONLY_CMDS.items():
+        if tuple(args[: len(prefix)]) == prefix:
+            return ttl if _CACHE_TTL_OVERRIDE is None else _CACHE_TTL_OVERRIDE
+    return 0.0
+
+
+def _coalescable(args: Sequence[str]) -> bool:
+    """True if concurrent identical `gtr <args>` calls may share one run."""
+    return any(tuple(args[: len(prefix)]) == prefix for prefix in _COALESCE_CMDS)
+
+
+def _invalidate_cache() -> None:
+    """Drop all cached results — call after anything that mutates the repo."""
+    global _cache_generation
+    _cache_generation += 1
+    _cache.clear()
+    # Runs already in flight keep serving their current waiters, but new
+    # callers must not join a read that started before the mutation.
+    _inflight.clear()
 
 
 async def _run_gtr(
-    args: list[str], cwd: Optional[str] = None, timeout: int = 120
+    args: Sequence[str], cwd: Optional[str] = None, timeout: int = 120
 ) -> dict:
     """
     Run a `gtr` CLI command and return structured output.
 
+    Results of read-only commands (see _READONLY_CMDS) are served from a
+    short-lived in-memory cache when the same command was run recently, and
+    identical idempotent calls already in flight (see _COALESCE_CMDS) are
+    joined rather than started again. Otherwise the command goes to the
+    persistent gtr daemon if one is available, falling back to spawning
+    `gtr` for this call.
+
     Returns:
         dict with keys: success (bool), stdout (str), stderr (str), returncode (int)
     """
-    cmd = ["gtr"] + args
     work_dir = cwd or _get_cwd()
+    key = (tuple(args), work_dir)
+    ttl = _cache_ttl(args)
+
+    if ttl > 0:
+        hit = _cache.get(key)
+        if hit is not None and time.monotonic() - hit[0] < ttl:
+            return dict(hit[1])
+
+    if not _coalescable(args):
+        return await _dispatch_gtr(args, work_dir, timeout, key, ttl)
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_dispatch_gtr(args, work_dir, timeout, key, ttl))
+        _inflight[key] = task
+
+        def _done(_: asyncio.Task, task: asyncio.Task = task) -> None:
+            if _inflight.get(key) is task:
+                del _inflight[key]
+
+        task.add_done_callback(_done)
+    # Shielded so one caller being cancelled doesn't cancel the shared run.
+    return dict(await asyncio.shield(task))
+
+
+async def _dispatch_gtr(
+    args: Sequence[str], work_dir: str, timeout: int, key: tuple, ttl: float
+) -> dict:
+    """Run `gtr <args>` via the daemon or a fresh process, caching on success."""
+    generation = _cache_generation
+    disk_key = None
+    if _disk_cacheable(args):
+        disk_key = await _disk_cache_key(args, work_dir)
+    if disk_key is not None:
+        hit = await asyncio.to_thread(_disk_cache_get, disk_key)
+        if hit is not None:
+            return hit
+
+    result = await _daemon.run(args, work_dir, timeout)
+    if result is None:
+        result = await _exec_gtr(args, work_dir, timeout)
+    if ttl > 0 and result["success"] and generation == _cache_generation:
+        _cache[key] = (time.monotonic(), dict(result))
+    if disk_key is not None and result["success"]:
+        await asyncio.to_thread(_disk_cache_put, disk_key, result)
+    return result
+
+
+async def _read_stream(stream: asyncio.StreamReader) -> bytearray:
+    """Read a subprocess pipe to EOF into a single growing buffer."""
+    buf = bytearray()
+    while chunk := await stream.read(65536):
+        buf += chunk
+    return buf
+
+
+async def _with_timeout(aw: Awaitable, timeout: float):
+    """
+    Await aw, raising asyncio.TimeoutError after timeout seconds.
+
+    Uses the asyncio.timeout() cancel scope on Python 3.11+, which avoids
+    the extra wrapper task asyncio.wait_for() creates.
+    """
+    if sys.version_info >= (3, 11):
+        async with asyncio.timeout(timeout):
+            return await aw
+    return await asyncio.wait_for(aw, timeout=timeout)
+
+
+def _timed_out(cmd: Sequence[str], timeout: float) -> dict:
+    """Result for a command that didn't finish within timeout seconds."""
+    return {
+        "success": False,
+        "stdout": "",
+        "stderr": f"Command timed out after {timeout}s: {' '.join(cmd)}",
+        "returncode": -1,
+    }
+
+
+async def _exec(
+    cmd: list[str], work_dir: str, timeout: int, slots: asyncio.Semaphore
+) -> dict:
+    """
+    Spawn `cmd` in work_dir once one of `slots` is free and collect its output.
 
+    Time spent waiting for a slot counts against timeout, so a quick command
+    queued behind long-running ones still comes back on time.
+
+    Raises FileNotFoundError if the executable isn't installed.
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        await _with_timeout(slots.acquire(), timeout)
+    except asyncio.TimeoutError:
+        return _timed_out(cmd, timeout)
     try:
         proc = await asyncio.create_subprocess_exec(
             *cmd,
@@ -69,12 +272,28 @@ async def _run_gtr(
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
             cwd=work_dir,
+            # Everything this process opens is non-inheritable (PEP 446), so
+            # skip the per-spawn sweep that closes inherited descriptors.
+            close_fds=False,
         )
-        stdout_bytes, stderr_bytes = await asyncio.wait_for(
-            proc.communicate(), timeout=timeout
+        stdout_bytes, stderr_bytes, _ = await _with_timeout(
+            asyncio.gather(
+                _read_stream(proc.stdout), _read_stream(proc.stderr), proc.wait()
+            ),
+            deadline - time.monotonic(),
+        )
+        # Strip before decoding, and skip decoding empty output entirely —
+        # common for branch/stream switches.
+        stdout = (
+            stdout_bytes.strip().decode("utf-8", errors="replace")
+            if stdout_bytes
+            else ""
+        )
+        stderr = (
+            stderr_bytes.strip().decode("utf-8", errors="replace")
+            if stderr_bytes
+            else ""
         )
-        stdout = stdout_bytes.decode("utf-8", errors="replace").strip()
-        stderr = stderr_bytes.decode("utf-8", errors="replace").strip()
         return {
             "success": proc.returncode == 0,
             "stdout": stdout,
@@ -82,37 +301,524 @@ async def _run_gtr(
             "returncode": proc.returncode,
         }
     except asyncio.TimeoutError:
+        # Don't leave the command running (and, for gtr, spending AI tokens)
+        # after we've stopped waiting for it. It may have exited on its own
+        # in the meantime, which is fine.
+        with contextlib.suppress(ProcessLookupError):
+            proc.kill()
+        await proc.wait()
+        return _timed_out(cmd, timeout)
+    finally:
+        slots.release()
+
+
+async def _exec_gtr(args: Sequence[str], work_dir: str, timeout: int) -> dict:
+    """Spawn `gtr <args>` in work_dir and collect its output."""
+    try:
+        return await _exec(["gtr", *args], work_dir, timeout, _spawn_slots)
+    except FileNotFoundError:
         return {
             "success": False,
             "stdout": "",
-            "stderr": f"Command timed out after {timeout}s: {' '.join(cmd)}",
+            "stderr": (
+                "gitrama CLI not found. Install with: pip install gitrama\n"
+                "Docs: https://gitrama.ai"
+            ),
             "returncode": -1,
         }
+
+
+async def _run_git(
+    args: Sequence[str], timeout: int = 60, cwd: Optional[str] = None
+) -> dict:
+    """Run a plain `git` command in the working directory (same dict as _run_gtr)."""
+    try:
+        return await _exec(["git", *args], cwd or _get_cwd(), timeout, _git_slots)
     except FileNotFoundError:
         return {
             "success": False,
             "stdout": "",
-            "stderr": (
-                "gitrama CLI not found. Install with: pip install gitrama\n"
-                "Docs: https://gitrama.ai"
-            ),
+            "stderr": "git not found. Install Git and make sure it is on PATH.",
             "returncode": -1,
         }
 
 
+class _GtrDaemon:
+    """
+    Client for a long-lived `gtr --mcp-daemon` process.
+
+    Spawning `gtr` per call pays interpreter startup plus CLI imports every
+    time; the daemon pays it once. The protocol is newline-delimited JSON
+    over the daemon's stdin/stdout:
+
+        → {"id": 1, "args": ["status"], "cwd": "/path/to/repo"}
+        ← {"id": 1, "returncode": 0, "stdout": "...", "stderr": ""}
+
+    The daemon announces itself with a first line of {"ready": true} and
+    exits when its stdin closes. {"id": 1, "cancel": true} asks it to kill
+    a command we stopped waiting for. Replies are matched to requests by id, so
+    several calls can be in flight at once.
+
+    No released gtr supports --mcp-daemon yet, so the daemon is opt-in:
+    set GTR_MCP_DAEMON=1 to use it. If it can't be started, or later exits
+    or sends something unparseable, it is marked unavailable and run()
+    returns None for new requests so the caller spawns gtr itself.
+    """
+
+    def __init__(self, cmd: Sequence[str] = ("gtr", "--mcp-daemon")) -> None:
+        self.cmd = cmd
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.lock = asyncio.Lock()
+        self.available = os.environ.get("GTR_MCP_DAEMON") == "1"
+        self._pending: dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._reader: Optional[asyncio.Task] = None
+
+    async def _start(self) -> bool:
+        """Spawn the daemon on first use. Returns False if it is unavailable."""
+        if self.proc is not None or not self.available:
+            return self.available
+        async with self.lock:
+            if self.proc is not None or not self.available:
+                return self.available
+            proc = None
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *self.cmd,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                    limit=64 * 1024 * 1024,
+                )
+                line = await asyncio.wait_for(proc.stdout.readline(), timeout=10)
+                if json.loads(line).get("ready") is not True:
+                    raise ValueError("unexpected handshake")
+            except (OSError, ValueError, AttributeError, asyncio.TimeoutError):
+                self.available = False
+                if proc is not None and proc.returncode is None:
+                    with contextlib.suppress(ProcessLookupError):
+                        proc.kill()
+                    await proc.wait()
+                return False
+            self.proc = proc
+            self._reader = asyncio.ensure_future(self._read_replies(proc))
+            return True
+
+    async def _read_replies(self, proc: asyncio.subprocess.Process) -> None:
+        """Route each reply line to the future of the request with its id."""
+        try:
+            while line := await proc.stdout.readline():
+                reply = json.loads(line)
+                fut = self._pending.pop(reply["id"], None)
+                if fut is not None and not fut.done():
+                    fut.set_result(reply)
+        except (ValueError, KeyError, TypeError):
+            pass
+        finally:
+            # EOF or protocol error — stop using the daemon, fail every call
+            # still waiting on it, and reap the process.
+            self.available = False
+            if proc.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    proc.kill()
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError("gtr daemon exited"))
+            self._pending.clear()
+            await proc.wait()
+
+    async def run(
+        self, args: Sequence[str], work_dir: str, timeout: int
+    ) -> Optional[dict]:
+        """
+        Run `gtr <args>` through the daemon.
+
+        Returns None only if the request never reached the daemon, so the
+        caller can safely spawn gtr instead. Once it has been sent the
+        command may already have run, so failures come back as an error
+        result rather than a retry.
+        """
+        if not await self._start():
+            return None
+
+        self._next_id += 1
+        req_id = self._next_id
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[req_id] = fut
+        try:
+            try:
+                request = {"id": req_id, "args": list(args), "cwd": work_dir}
+                self.proc.stdin.write(json.dumps(request).encode() + b"\n")
+                await self.proc.stdin.drain()
+            except OSError:
+                return None
+
+            try:
+                reply = await _with_timeout(fut, timeout)
+                returncode = int(reply["returncode"])
+            except asyncio.TimeoutError:
+                # Ask the daemon to abandon the command so it stops spending
+                # AI tokens on an answer nobody is waiting for.
+                with contextlib.suppress(OSError):
+                    cancel = {"id": req_id, "cancel": True}
+                    self.proc.stdin.write(json.dumps(cancel).encode() + b"\n")
+                return _timed_out(["gtr", *args], timeout)
+            except (OSError, KeyError, TypeError, ValueError):
+                return {
+                    "success": False,
+                    "stdout": "",
+                    "stderr": (
+                        "gtr daemon failed before replying to: "
+                        f"gtr {' '.join(args)}\n"
+                        "The command may or may not have run — check before retrying."
+                    ),
+                    "returncode": -1,
+                }
+            return {
+                "success": returncode == 0,
+                "stdout": str(reply.get("stdout") or "").strip(),
+                "stderr": str(reply.get("stderr") or "").strip(),
+                "returncode": returncode,
+            }
+        finally:
+            self._pending.pop(req_id, None)
+
+
+_daemon = _GtrDaemon()
+
+# Whether `gtr commit` accepts --add (see gitrama_stage_and_commit). Flipped
+# to False the first time the installed CLI rejects it.
+_GTR_COMMIT_ADD = True
+
+
+def _rejected_option(result: dict, option: str) -> bool:
+    """True if a gtr call failed only because the CLI doesn't know `option`."""
+    if result["success"]:
+        return False
+    err = result["stderr"].lower()
+    return option in err and ("no such option" in err or "unknown option" in err)
+
+
+def _with_flags(
+    args: list[str], pairs: Sequence[tuple[str, Optional[str]]]
+) -> list[str]:
+    """Append `flag value` to args for every (flag, value) pair with a value."""
+    for flag, value in pairs:
+        if value:
+            args.append(flag)
+            args.append(value)
+    return args
+
+
+def _is_trivial_commit(message: str) -> bool:
+    """
+    True if a commit can be made with plain `git commit`, skipping gtr.
+
+    A caller-supplied message leaves nothing for the AI to do, so there's
+    no reason to pay gtr's startup for it.
+    """
+    return bool(message.strip())
+
+
 def _format_result(result: dict, context: str = "") -> str:
     """Format a CLI result into a clean MCP response."""
+    out = result["stdout"]
     if result["success"]:
-        return result["stdout"] if result["stdout"] else f"✅ {context or 'Done'}"
-    else:
-        msg = result["stderr"] or result["stdout"] or "Unknown error"
-        return f"❌ Error: {msg}"
+        return out if out else f"✅ {context or 'Done'}"
+    return f"❌ Error: {result['stderr'] or out or 'Unknown error'}"
+
+
+# ---------------------------------------------------------------------------
+# Persistent result cache
+# ---------------------------------------------------------------------------
+
+# gtr subcommands whose answer is fixed by repo state + arguments and costly
+# enough (an LLM round trip) to keep on disk across server restarts.
+_DISK_CACHE_CMDS: set[tuple[str, ...]] = {("ask",)}
+
+_DISK_CACHE_MAX_BYTES = 200 * 1024 * 1024
+# Even at a fixed HEAD, answers to questions like "what changed in the last
+# 3 days?" drift over time, so entries also expire after a day.
+_DISK_CACHE_MAX_AGE = 24 * 60 * 60
+
+# Set GTR_MCP_DISK_CACHE=0 to disable. Also switched off if the cache file
+# can't be opened.
+_disk_cache_enabled = os.environ.get("GTR_MCP_DISK_CACHE", "1") != "0"
+_disk_db: Optional["sqlite3.Connection"] = None
+
+# gtr state that feeds into `ask` answers but lives outside the repo: the
+# active stream, and the provider/model picked with `gtr config set`.
+_GITRAMA_DIR = os.path.join(os.path.expanduser("~"), ".gitrama")
+_STREAMS_FILE = os.path.join(_GITRAMA_DIR, "streams.json")
+_CONFIG_FILE = os.path.join(_GITRAMA_DIR, "config.json")
+
+# Cache lookups and stores run in worker threads (asyncio.to_thread), so the
+# shared connection is opened with check_same_thread=False and guarded here.
+_disk_lock = threading.Lock()
+
+
+def _disk_cacheable(args: Sequence[str]) -> bool:
+    """True if the result of `gtr <args>` may be stored in the disk cache."""
+    return _disk_cache_enabled and any(
+        tuple(args[: len(prefix)]) == prefix for prefix in _DISK_CACHE_CMDS
+    )
+
+
+def _find_repo(work_dir: str) -> Optional[tuple[str, str]]:
+    """
+    Find the repository containing work_dir.
+
+    Returns (worktree root, .git directory), following worktree .git files,
+    or None outside a repository.
+    """
+    path = os.path.abspath(work_dir)
+    while True:
+        dotgit = os.path.join(path, ".git")
+        if os.path.isdir(dotgit):
+            return path, dotgit
+        if os.path.isfile(dotgit):
+            with open(dotgit, encoding="utf-8") as f:
+                line = f.read().strip()
+            if line.startswith("gitdir: "):
+                git_dir = os.path.join(path, line[len("gitdir: ") :])
+                return path, os.path.normpath(git_dir)
+            return None
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+
+
+def _resolve_ref(git_dir: str, ref: str) -> Optional[str]:
+    """Resolve a ref like refs/heads/main to a commit sha without running git."""
+    common_dir = git_dir
+    commondir_file = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_file):
+        with open(commondir_file, encoding="utf-8") as f:
+            common_dir = os.path.normpath(os.path.join(git_dir, f.read().strip()))
+
+    for base in (git_dir, common_dir):
+        try:
+            with open(os.path.join(base, ref), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            pass
+    try:
+        with open(os.path.join(common_dir, "packed-refs"), encoding="utf-8") as f:
+            for line in f:
+                sha, _, name = line.strip().partition(" ")
+                if name == ref:
+                    return sha
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def _hash_worktree(root: str, status: str) -> str:
+    """Hash `git status --porcelain=v2 -z` output plus each listed file's stat."""
+    # Number of space-separated fields before the path, per entry type.
+    path_field = {"1": 8, "2": 9, "u": 10, "?": 1, "!": 1}
+    digest = hashlib.blake2b(status.encode("utf-8"), digest_size=20)
+    entries = iter(status.split("\0"))
+    for entry in entries:
+        fields = path_field.get(entry[:1])
+        if fields is None:
+            continue
+        if entry[0] == "2":
+            next(entries, None)  # rename/copy source path
+        path = entry.split(" ", fields)[-1]
+        try:
+            st = os.stat(os.path.join(root, path))
+            digest.update(f"\0{path}\0{st.st_mtime_ns}\0{st.st_size}".encode())
+        except OSError:
+            digest.update(f"\0{path}\0-".encode())
+    return digest.hexdigest()
+
+
+async def _worktree_state(root: str) -> Optional[str]:
+    """
+    Fingerprint uncommitted changes in the worktree at root.
+
+    `gtr ask` looks at the working tree (git status / git diff), so edits
+    that haven't been staged must change the cache key too. Hashes the
+    porcelain status plus the mtime and size of every changed or untracked
+    file, so further edits to an already-dirty file are also picked up.
+    """
+    status = await _run_git(
+        (
+            "--no-optional-locks",
+            "status",
+            "--porcelain=v2",
+            "-z",
+            "--untracked-files=all",
+        ),
+        timeout=30,
+        cwd=root,
+    )
+    if not status["success"]:
+        return None
+    return await asyncio.to_thread(_hash_worktree, root, status["stdout"])
+
+
+def _read_repo_files(work_dir: str) -> Optional[tuple[str, str]]:
+    """
+    Find the repository containing work_dir and fingerprint its files.
+
+    Returns (worktree root, "HEAD:index mtime:streams mtime:config mtime"),
+    or None outside a repository or on an unborn branch. HEAD is read
+    straight from .git rather than by spawning git.
+    """
+    try:
+        repo = _find_repo(work_dir)
+        if repo is None:
+            return None
+        root, git_dir = repo
+        with open(os.path.join(git_dir, "HEAD"), encoding="utf-8") as f:
+            head = f.read().strip()
+        if head.startswith("ref: "):
+            head = _resolve_ref(git_dir, head[len("ref: ") :])
+        if not head:
+            return None  # unborn branch
+        stamps = []
+        for path in (os.path.join(git_dir, "index"), _STREAMS_FILE, _CONFIG_FILE):
+            try:
+                stamps.append(str(os.stat(path).st_mtime_ns))
+            except FileNotFoundError:
+                stamps.append("-")
+    except OSError:
+        return None
+    return root, ":".join([head, *stamps])
+
+
+async def _repo_state(work_dir: str) -> Optional[str]:
+    """
+    Return a fingerprint of the repository, or None if there isn't one.
+
+    Combines the HEAD commit, the index and gtr stream/config file mtimes,
+    and the state of the working tree, so it changes on commit, checkout,
+    staging, unstaged edits, stream switches and provider/model changes.
+    File reads run in a worker thread to keep the event loop free for
+    other clients.
+    """
+    repo = await asyncio.to_thread(_read_repo_files, work_dir)
+    if repo is None:
+        return None
+    root, files = repo
+    worktree = await _worktree_state(root)
+    if worktree is None:
+        return None
+    return f"{files}:{worktree}"
+
+
+async def _disk_cache_key(args: Sequence[str], work_dir: str) -> Optional[str]:
+    """Hash repo state, directory and argv into a cache key (None = don't cache)."""
+    state = await _repo_state(work_dir)
+    if state is None:
+        return None
+    raw = "\0".join([state, work_dir, *args])
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _disk_cache_db() -> Optional["sqlite3.Connection"]:
+    """Open the cache database on first use (~/.cache/gitrama-mcp/)."""
+    global _disk_db, _disk_cache_enabled
+    if _disk_db is None and _disk_cache_enabled:
+        # Imported here so server startup doesn't load sqlite3 until the
+        # first cacheable call.
+        import sqlite3
+
+        cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+        cache_dir = os.path.join(cache_home, "gitrama-mcp")
+        db_path = os.path.join(cache_dir, "results.sqlite3")
+        try:
+            # Answers describe private repository code — keep them readable
+            # by the current user only.
+            os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+            os.chmod(cache_dir, 0o700)
+            os.close(os.open(db_path, os.O_CREAT | os.O_RDWR, 0o600))
+            os.chmod(db_path, 0o600)
+            db = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, used REAL NOT NULL)"
+            )
+        except (OSError, sqlite3.Error):
+            _disk_cache_enabled = False
+            return None
+        _disk_db = db
+    return _disk_db
+
+
+def _disk_cache_get(key: str) -> Optional[dict]:
+    """
+    Return the stored result for key, or None on a miss or stale entry.
+
+    Blocking — run it in a worker thread.
+    """
+    with _disk_lock:
+        db = _disk_cache_db()
+        if db is None:
+            return None
+        now = time.time()
+        # db.Error is sqlite3.Error (a DB-API connection attribute), so the
+        # module is only imported in _disk_cache_db().
+        try:
+            row = db.execute(
+                "SELECT result, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > _DISK_CACHE_MAX_AGE:
+                db.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            db.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+        except (db.Error, ValueError):
+            return None
+
+
+def _disk_cache_put(key: str, result: dict) -> None:
+    """
+    Store a result, evicting least recently used entries beyond the size cap.
+
+    Blocking — run it in a worker thread.
+    """
+    with _disk_lock:
+        db = _disk_cache_db()
+        if db is None:
+            return
+        data = json.dumps(result)
+        now = time.time()
+        try:
+            db.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now),
+            )
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[
+                0
+            ]
+            if total <= _DISK_CACHE_MAX_BYTES:
+                return
+            rows = db.execute("SELECT key, size FROM results ORDER BY used").fetchall()
+            for old_key, size in rows:
+                db.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                total -= size
+                if total <= _DISK_CACHE_MAX_BYTES:
+                    break
+        except db.Error:
+            pass
 
 
 # ---------------------------------------------------------------------------
 # Tool 1: gitrama_commit
 # ---------------------------------------------------------------------------
 
+# Argv for the common no-override call, shared instead of rebuilt per call.
+_COMMIT_DEFAULT = ("commit", "-y")
+
 
 @mcp.tool()
 async def gitrama_commit(
@@ -129,11 +835,11 @@ async def gitrama_commit(
         message: Optional custom commit message. If provided, skips AI
                  generation and uses this message directly.
     """
-    args = ["commit", "-y"]
-    if message:
-        args.extend(["-m", message])
-
-    result = await _run_gtr(args)
+    if _is_trivial_commit(message):
+        result = await _run_git(("commit", "-m", message))
+    else:
+        result = await _run_gtr(_COMMIT_DEFAULT)
+    _invalidate_cache()
     return _format_result(result, "Commit created")
 
 
@@ -159,20 +865,38 @@ async def gitrama_stage_and_commit(
         message: Optional custom commit message. If provided, skips AI
                  generation and uses this message directly.
     """
+    global _GTR_COMMIT_ADD
+    if files == "." or not files:
+        file_list: Sequence[str] = (".",)
+    else:
+        file_list = files.split()
+        # Paths are passed straight to git/gtr, so refuse anything that
+        # would be parsed as an option instead.
+        if any(f.startswith("-") for f in file_list):
+            return "❌ Invalid file path: paths must not start with '-'"
+
+    # Fast path: stage and commit in a single gtr process. This relies on
+    # a repeatable `gtr commit --add PATH` option (stage the paths, then
+    # commit), which needs to land upstream in gitrama. gtr is a click app,
+    # where a list option takes one value per flag, so each path gets its
+    # own `--add`. Releases without it reject the option before doing
+    # anything, so we remember that and use the two-step path from then on.
+    # A commit with a ready-made message skips gtr altogether (see
+    # gitrama_commit), so only the AI path is worth fusing.
+    if _GTR_COMMIT_ADD and not _is_trivial_commit(message):
+        args = _with_flags([*_COMMIT_DEFAULT], [("--add", path) for path in file_list])
+        result = await _run_gtr(args)
+        if not _rejected_option(result, "--add"):
+            _invalidate_cache()
+            return _format_result(result, "Commit created")
+        _GTR_COMMIT_ADD = False
+
     # Stage files first
-    file_list = files.split() if files != "." else ["."]
-    stage_cmd = ["git", "add"] + file_list
-    try:
-        stage_proc = await asyncio.create_subprocess_exec(
-            *stage_cmd,
-            stdin=asyncio.subprocess.DEVNULL,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=_get_cwd(),
-        )
-        await stage_proc.communicate()
-    except Exception as e:
-        return f"❌ Failed to stage files: {e}"
+    staged = await _run_git(["add", "--", *file_list])
+    _invalidate_cache()
+    if not staged["success"]:
+        msg = staged["stderr"] or staged["stdout"] or "Unknown error"
+        return f"❌ Failed to stage files: {msg}"
 
     # Now commit
     return await gitrama_commit(message=message)
@@ -207,9 +931,7 @@ async def gitrama_ask(
         stream: Optional stream context override (wip | hotfix | review | experiment).
         deep: Enable full repo history access for deeper analysis.
     """
-    args = ["ask", "--query", question]
-    if stream:
-        args.extend(["--stream", stream])
+    args = _with_flags(["ask", "--query", question], (("--stream", stream),))
     if deep:
         args.append("--deep")
     result = await _run_gtr(args, timeout=180)
@@ -248,6 +970,7 @@ async def gitrama_branch(
     if not create:
         args.append("--no-create")
     result = await _run_gtr(args)
+    _invalidate_cache()
     return _format_result(result, "Branch created")
 
 
@@ -255,6 +978,8 @@ async def gitrama_branch(
 # Tool 5: gitrama_pr
 # ---------------------------------------------------------------------------
 
+_PR_DEFAULT = ("pr",)
+
 
 @mcp.tool()
 async def gitrama_pr(
@@ -270,9 +995,10 @@ async def gitrama_pr(
     Args:
         base: Target branch for the PR (default: main or master).
     """
-    args = ["pr"]
-    if base:
-        args.extend(["--base", base])
+    if not base:
+        args = _PR_DEFAULT
+    else:
+        args = _with_flags([*_PR_DEFAULT], (("--base", base),))
     result = await _run_gtr(args)
     return _format_result(result, "PR description generated")
 
@@ -291,7 +1017,7 @@ async def gitrama_stream_status() -> str:
     you're working on and influence AI suggestions. Returns the active
     stream name, description, and associated branch.
     """
-    result = await _run_gtr(["stream", "status"])
+    result = await _run_gtr(("stream", "status"))
     return _format_result(result, "Stream status retrieved")
 
 
@@ -315,10 +1041,9 @@ async def gitrama_stream_switch(
         name: Stream name (e.g., "auth-refactor", "payment-v2").
         description: Optional description of the stream's purpose.
     """
-    args = ["stream", "switch", name]
-    if description:
-        args.extend(["--description", description])
+    args = _with_flags(["stream", "switch", name], (("--description", description),))
     result = await _run_gtr(args)
+    _invalidate_cache()
     return _format_result(result, f"Switched to stream '{name}'")
 
 
@@ -335,7 +1060,7 @@ async def gitrama_stream_list() -> str:
     Shows all defined streams with their names, descriptions,
     and associated branches. The active stream is highlighted.
     """
-    result = await _run_gtr(["stream", "list"])
+    result = await _run_gtr(("stream", "list"))
     return _format_result(result, "Streams listed")
 
 
@@ -353,7 +1078,7 @@ async def gitrama_health() -> str:
     the current server status and MCP server version. Useful for
     diagnosing issues when other commands fail.
     """
-    result = await _run_gtr(["health"])
+    result = await _run_gtr(("health",))
     output = _format_result(result, "Health check complete")
     return f"{output}\n\n🔖 Gitrama MCP Server: v{__version__}"
 
@@ -371,7 +1096,7 @@ async def gitrama_status() -> str:
     Displays the current git status including staged, unstaged,
     and untracked files with AI-powered context about the changes.
     """
-    result = await _run_gtr(["status"])
+    result = await _run_gtr(("status",))
     return _format_result(result, "Status retrieved")
 
 
@@ -379,6 +1104,8 @@ async def gitrama_status() -> str:
 # Tool 11: gitrama_diff
 # ---------------------------------------------------------------------------
 
+_DIFF_DEFAULT = ("diff",)
+
 
 @mcp.tool()
 async def gitrama_diff(
@@ -396,11 +1123,14 @@ async def gitrama_diff(
         target: Branch or commit to diff against (default: working tree).
         staged: If True, diff staged changes only (default: all changes).
     """
-    args = ["diff"]
-    if target:
-        args.append(target)
-    if staged:
-        args.append("--staged")
+    if not (target or staged):
+        args = _DIFF_DEFAULT
+    else:
+        args = list(_DIFF_DEFAULT)
+        if target:
+            args.append(target)
+        if staged:
+            args.append("--staged")
     result = await _run_gtr(args, timeout=180)
     return _format_result(result, "Diff complete")
 
@@ -409,6 +1139,13 @@ async def gitrama_diff(
 # Tool 12: gitrama_review
 # ---------------------------------------------------------------------------
 
+_REVIEW_ARGS = {
+    "staged": ("review",),
+    "uncommitted": ("review", "--uncommitted"),
+    "quick": ("review", "--quick"),
+    "full": ("review", "--full"),
+}
+
 
 @mcp.tool()
 async def gitrama_review(
@@ -430,13 +1167,7 @@ async def gitrama_review(
               "quick"       — critical issues only
               "full"        — full review with suggestions
     """
-    mode_flags = {
-        "staged": [],
-        "uncommitted": ["--uncommitted"],
-        "quick": ["--quick"],
-        "full": ["--full"],
-    }
-    args = ["review"] + mode_flags.get(mode, [])
+    args = _REVIEW_ARGS.get(mode, _REVIEW_ARGS["staged"])
     result = await _run_gtr(args, timeout=300)
     return _format_result(result, "Review complete")
 
@@ -445,6 +1176,8 @@ async def gitrama_review(
 # Tool 13: gitrama_unstage
 # ---------------------------------------------------------------------------
 
+_UNSTAGE_DEFAULT = ("unstage",)
+
 
 @mcp.tool()
 async def gitrama_unstage(
@@ -462,12 +1195,14 @@ async def gitrama_unstage(
                interactive selection (CLI only).
         all_files: If True, unstage everything currently staged.
     """
-    args = ["unstage"]
     if all_files:
-        args.append("--all")
+        args = [*_UNSTAGE_DEFAULT, "--all"]
     elif files:
-        args.extend(files.split())
+        args = [*_UNSTAGE_DEFAULT, *files.split()]
+    else:
+        args = _UNSTAGE_DEFAULT
     result = await _run_gtr(args)
+    _invalidate_cache()
     return _format_result(result, "Files unstaged")
 
 
@@ -487,7 +1222,7 @@ async def gitrama_scan() -> str:
 
     Results are cached in last_scan.json for use by gtr diff and gtr review.
     """
-    result = await _run_gtr(["scan"], timeout=300)
+    result = await _run_gtr(("scan",), timeout=300)
     return _format_result(result, "Scan complete")
 
 
@@ -518,17 +1253,10 @@ async def gitrama_push(
     """
     # Resolve current branch if none specified
     if not branch:
-        branch_result = await asyncio.create_subprocess_exec(
-            "git",
-            "rev-parse",
-            "--abbrev-ref",
-            "HEAD",
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            cwd=_get_cwd(),
+        branch_result = await _run_git(
+            ("rev-parse", "--abbrev-ref", "HEAD"), timeout=10
         )
-        stdout, _ = await branch_result.communicate()
-        branch = stdout.decode("utf-8").strip()
+        branch = branch_result["stdout"]
 
     args = ["push", remote, branch]
 
@@ -538,6 +1266,7 @@ async def gitrama_push(
         args.append("--force-with-lease")
 
     result = await _run_gtr(args)
+    _invalidate_cache()
     return _format_result(result, f"Pushed {branch} to {remote}")
 
 
@@ -546,11 +1275,41 @@ async def gitrama_push(
 # ---------------------------------------------------------------------------
 
 
+def _warmup() -> None:
+    """
+    Run `gtr --version` once in a background thread at startup.
+
+    The first tool call would otherwise pay gtr's cold start (interpreter,
+    imports, page cache) on its own; this gets it out of the way while the
+    client is still connecting. Errors are ignored — a missing or broken
+    gtr is reported by the tool call that needs it.
+    """
+
+    def run() -> None:
+        try:
+            subprocess.run(
+                ["gtr", "--version"],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=5,
+                check=False,
+            )
+        except (OSError, subprocess.SubprocessError):
+            pass
+
+    threading.Thread(target=run, name="gtr-warmup", daemon=True).start()
+
+
 def main():
     """Run the Gitrama MCP server."""
 
-    # TTY detection — if a human runs this directly, show help and exit
-    if sys.stdin.isatty() and os.environ.get("GTR_MCP_TRANSPORT", "stdio") == "stdio":
+    transport = os.environ.get("GTR_MCP_TRANSPORT")
+
+    # TTY detection — if a human runs this directly, show help and exit.
+    # MCP hosts and deployments set GTR_MCP_TRANSPORT or pipe stdin, so the
+    # isatty() check only runs when no transport was configured.
+    if transport is None and sys.stdin.isatty():
         sys.stdout.reconfigure(encoding="utf-8")
         print(f"""
 🌿 Gitrama MCP Server v{__version__}
@@ -593,9 +1352,10 @@ PyPI:  pip install gitrama-mcp
 """)
         sys.exit(0)
 
-    transport = os.environ.get("GTR_MCP_TRANSPORT", "stdio")
+    transport = transport or "stdio"
 
     if transport == "stdio":
+        _warmup()
         mcp.run(transport="stdio")
     elif transport in ("streamable-http", "sse"):
         # Both HTTP transports share the same host/port config.
@@ -608,6 +1368,7 @@ PyPI:  pip install gitrama-mcp
         port = int(os.environ.get("GTR_MCP_PORT", "8765"))
         mcp.settings.host = host
         mcp.settings.port = port
+        _warmup()
         mcp.run(transport=transport)
     else:
         print(
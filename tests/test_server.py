@@ -0,0 +1,701 @@
+"""
+Gitrama MCP Server Test Suite
+
+Tests for gitrama_mcp.server. The gtr CLI is never run — tests patch the
+subprocess helpers or drive small stand-in processes instead.
+
+Run with: pytest tests/ -v
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from gitrama_mcp import server
+
+
+# ─── Fixtures ─────────────────────────────────────────────────────────────────
+
+@pytest.fixture(autouse=True)
+def isolated_server(monkeypatch):
+    """Start every test with empty caches, no daemon and no disk cache."""
+    server._cache.clear()
+    server._inflight.clear()
+    monkeypatch.setattr(server._daemon, "available", False)
+    monkeypatch.setattr(server, "_disk_cache_enabled", False)
+    yield
+    server._cache.clear()
+    server._inflight.clear()
+
+
+@pytest.fixture
+def fake_gtr(monkeypatch):
+    """Replace _exec_gtr with a recorder that returns a canned success."""
+    calls = []
+
+    async def fake_exec(args, work_dir, timeout):
+        calls.append(tuple(args))
+        run = len(calls)
+        await asyncio.sleep(0.05)
+        return {
+            "success": True,
+            "stdout": f"run {run}",
+            "stderr": "",
+            "returncode": 0,
+        }
+
+    monkeypatch.setattr(server, "_exec_gtr", fake_exec)
+    return calls
+
+
+def git(repo_dir, *args):
+    subprocess.run(["git", *args], cwd=repo_dir, capture_output=True, check=True)
+
+
+@pytest.fixture
+def temp_git_repo(tmp_path):
+    """Create a temporary Git repository with one commit."""
+    repo_dir = tmp_path / "test-repo"
+    repo_dir.mkdir()
+
+    git(repo_dir, "init")
+    git(repo_dir, "config", "user.email", "test@gitrama.ai")
+    git(repo_dir, "config", "user.name", "Test User")
+    (repo_dir / "README.md").write_text("# Test Repo\n")
+    git(repo_dir, "add", ".")
+    git(repo_dir, "commit", "-m", "Initial commit")
+
+    return repo_dir
+
+
+# ─── TTL Cache Tests ──────────────────────────────────────────────────────────
+
+class TestResultCache:
+    """Tests for the short-lived cache of read-only gtr commands."""
+
+    def test_readonly_command_served_from_cache(self, fake_gtr, tmp_path):
+        """A repeated read-only command is answered without running gtr again."""
+        async def run():
+            first = await server._run_gtr(("stream", "status"), cwd=str(tmp_path))
+            second = await server._run_gtr(("stream", "status"), cwd=str(tmp_path))
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert fake_gtr == [("stream", "status")]
+        assert first == second
+
+    def test_invalidate_cache_clears_hits(self, fake_gtr, tmp_path):
+        """After _invalidate_cache() the next call runs gtr again."""
+        async def run():
+            await server._run_gtr(("stream", "list"), cwd=str(tmp_path))
+            server._invalidate_cache()
+            await server._run_gtr(("stream", "list"), cwd=str(tmp_path))
+
+        asyncio.run(run())
+        assert len(fake_gtr) == 2
+
+    def test_mutating_command_not_cached(self, fake_gtr, tmp_path):
+        """Commands outside the read-only whitelist always run."""
+        async def run():
+            await server._run_gtr(("branch", "fix login"), cwd=str(tmp_path))
+            await server._run_gtr(("branch", "fix login"), cwd=str(tmp_path))
+
+        asyncio.run(run())
+        assert len(fake_gtr) == 2
+
+    def test_status_sees_edits_made_outside_the_server(
+        self, monkeypatch, temp_git_repo
+    ):
+        """An edit between two status calls shows up in the second one."""
+        async def fake_status(args, work_dir, timeout):
+            return await server._run_git(("status", "--porcelain"), cwd=work_dir)
+
+        monkeypatch.setattr(server, "_exec_gtr", fake_status)
+
+        async def run():
+            before = await server._run_gtr(("status",), cwd=str(temp_git_repo))
+            (temp_git_repo / "README.md").write_text("edited by the client\n")
+            after = await server._run_gtr(("status",), cwd=str(temp_git_repo))
+            return before, after
+
+        before, after = asyncio.run(run())
+        assert before["stdout"] == ""
+        assert after["stdout"] == "M README.md"
+
+    def test_invalid_ttl_override_falls_back_to_defaults(self):
+        """A malformed GTR_MCP_CACHE_TTL is ignored rather than raising."""
+        assert server._parse_cache_ttl("5s") is None
+        assert server._parse_cache_ttl("") is None
+        assert server._parse_cache_ttl("0") == 0.0
+        assert server._parse_cache_ttl("2.5") == 2.5
+
+
+# ─── In-flight Coalescing Tests ───────────────────────────────────────────────
+
+class TestCoalescing:
+    """Tests for sharing one run between concurrent identical calls."""
+
+    def test_concurrent_identical_ask_share_one_run(self, fake_gtr, tmp_path):
+        """Identical concurrent `ask` calls spawn gtr once and all get the answer."""
+        args = ("ask", "--query", "Who owns auth?")
+
+        async def run():
+            return await asyncio.gather(
+                *(server._run_gtr(args, cwd=str(tmp_path)) for _ in range(3))
+            )
+
+        results = asyncio.run(run())
+        assert fake_gtr == [args]
+        assert all(r["stdout"] == "run 1" for r in results)
+        # Every caller gets its own dict.
+        assert len({id(r) for r in results}) == 3
+
+    def test_different_questions_not_shared(self, fake_gtr, tmp_path):
+        """Only identical argv is coalesced."""
+        async def run():
+            await asyncio.gather(
+                server._run_gtr(("ask", "--query", "a"), cwd=str(tmp_path)),
+                server._run_gtr(("ask", "--query", "b"), cwd=str(tmp_path)),
+            )
+
+        asyncio.run(run())
+        assert len(fake_gtr) == 2
+
+    def test_mutation_clears_inflight(self, fake_gtr, tmp_path):
+        """A call made after a mutation doesn't join a run started before it."""
+        args = ("ask", "--query", "What changed?")
+
+        async def run():
+            first = asyncio.ensure_future(server._run_gtr(args, cwd=str(tmp_path)))
+            await asyncio.sleep(0)
+            assert server._inflight
+            server._invalidate_cache()
+            assert not server._inflight
+            second = await server._run_gtr(args, cwd=str(tmp_path))
+            return await first, second
+
+        first, second = asyncio.run(run())
+        assert len(fake_gtr) == 2
+        assert first["stdout"] != second["stdout"]
+
+
+# ─── Disk Cache Key Tests ─────────────────────────────────────────────────────
+
+class TestDiskCacheKey:
+    """Tests for the repository fingerprint behind the persistent cache."""
+
+    ARGS = ("ask", "--query", "What changed?")
+
+    def key(self, repo):
+        return asyncio.run(server._disk_cache_key(self.ARGS, str(repo)))
+
+    def test_key_stable_without_changes(self, temp_git_repo):
+        """The same repo state produces the same key."""
+        assert self.key(temp_git_repo) == self.key(temp_git_repo)
+
+    def test_key_changes_on_unstaged_edit(self, temp_git_repo):
+        """Editing a tracked file without staging it changes the key."""
+        before = self.key(temp_git_repo)
+        (temp_git_repo / "README.md").write_text("# Test Repo\nmore\n")
+        after_first_edit = self.key(temp_git_repo)
+        (temp_git_repo / "README.md").write_text("# Test Repo\nmore and more\n")
+        assert len({before, after_first_edit, self.key(temp_git_repo)}) == 3
+
+    def test_key_changes_on_staging(self, temp_git_repo):
+        """Staging a new file changes the key."""
+        (temp_git_repo / "new.py").write_text("x = 1\n")
+        before = self.key(temp_git_repo)
+        git(temp_git_repo, "add", "new.py")
+        assert self.key(temp_git_repo) != before
+
+    def test_key_changes_on_commit(self, temp_git_repo):
+        """A new commit changes the key."""
+        (temp_git_repo / "new.py").write_text("x = 1\n")
+        git(temp_git_repo, "add", "new.py")
+        before = self.key(temp_git_repo)
+        git(temp_git_repo, "commit", "-m", "Add new.py")
+        assert self.key(temp_git_repo) != before
+
+    def test_no_key_outside_repo(self, tmp_path):
+        """Outside a Git repository nothing is cached."""
+        assert self.key(tmp_path) is None
+
+    def test_key_changes_on_gtr_config_change(self, monkeypatch, temp_git_repo):
+        """Switching provider/model with `gtr config set` changes the key."""
+        config = temp_git_repo.parent / "config.json"
+        config.write_text('{"provider": "openai"}')
+        os.utime(config, ns=(1_000_000_000, 1_000_000_000))
+        monkeypatch.setattr(server, "_CONFIG_FILE", str(config))
+        before = self.key(temp_git_repo)
+        config.write_text('{"provider": "ollama"}')
+        os.utime(config, ns=(2_000_000_000, 2_000_000_000))
+        assert self.key(temp_git_repo) != before
+
+
+class TestDiskCache:
+    """Tests for storing and serving `ask` answers from the on-disk cache."""
+
+    @pytest.fixture
+    def disk_cache(self, monkeypatch, tmp_path):
+        monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+        monkeypatch.setattr(server, "_disk_cache_enabled", True)
+        monkeypatch.setattr(server, "_disk_db", None)
+        yield tmp_path / "cache" / "gitrama-mcp"
+        if server._disk_db is not None:
+            server._disk_db.close()
+
+    def test_answer_served_from_disk(self, disk_cache, fake_gtr, temp_git_repo):
+        """The same question at the same repo state doesn't run gtr again."""
+        args = ("ask", "--query", "What changed?")
+
+        async def run():
+            first = await server._run_gtr(args, cwd=str(temp_git_repo))
+            server._invalidate_cache()
+            second = await server._run_gtr(args, cwd=str(temp_git_repo))
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert fake_gtr == [args]
+        assert first == second
+        assert (disk_cache / "results.sqlite3").stat().st_mode & 0o777 == 0o600
+        assert disk_cache.stat().st_mode & 0o777 == 0o700
+
+
+# ─── Stage and Commit Validation Tests ────────────────────────────────────────
+
+class TestStageAndCommitPaths:
+    """Tests for path handling in gitrama_stage_and_commit."""
+
+    @pytest.fixture
+    def mock_git(self, monkeypatch):
+        ok = {"success": True, "stdout": "", "stderr": "", "returncode": 0}
+        run_git = AsyncMock(return_value=ok)
+        run_gtr = AsyncMock(return_value=ok)
+        monkeypatch.setattr(server, "_run_git", run_git)
+        monkeypatch.setattr(server, "_run_gtr", run_gtr)
+        return run_git, run_gtr
+
+    @pytest.mark.parametrize("files", ["--force", "src/a.py -n", "-A"])
+    def test_dash_prefixed_paths_rejected(self, mock_git, files):
+        """Paths that git would parse as options are refused before running."""
+        result = asyncio.run(server.gitrama_stage_and_commit(files=files))
+        assert result.startswith("❌ Invalid file path")
+        for mock in mock_git:
+            mock.assert_not_called()
+
+    def test_paths_passed_after_separator(self, mock_git):
+        """Valid paths are staged after a `--` separator."""
+        run_git, _ = mock_git
+        asyncio.run(
+            server.gitrama_stage_and_commit(files="src/a.py b.py", message="fix: x")
+        )
+        assert run_git.await_args_list[0].args[0] == ["add", "--", "src/a.py", "b.py"]
+
+    def test_failed_add_reported(self, monkeypatch, temp_git_repo):
+        """A git add that fails stops before committing and says why."""
+        monkeypatch.setenv("GTR_CWD", str(temp_git_repo))
+
+        result = asyncio.run(
+            server.gitrama_stage_and_commit(files="missing.py", message="fix: x")
+        )
+
+        assert result.startswith("❌ Failed to stage files:")
+        assert "missing.py" in result
+        log = subprocess.run(
+            ["git", "log", "--format=%s"],
+            cwd=temp_git_repo,
+            capture_output=True,
+            text=True,
+        )
+        assert log.stdout.split("\n")[0] == "Initial commit"
+
+
+# ─── Stage and Commit Fast Path Tests ─────────────────────────────────────────
+
+class TestStageAndCommitFastPath:
+    """Tests for the single `gtr commit --add` call and its fallback."""
+
+    OK = {"success": True, "stdout": "", "stderr": "", "returncode": 0}
+
+    @pytest.fixture
+    def run_git(self, monkeypatch):
+        monkeypatch.setattr(server, "_GTR_COMMIT_ADD", True)
+        run_git = AsyncMock(return_value=self.OK)
+        monkeypatch.setattr(server, "_run_git", run_git)
+        return run_git
+
+    def fake_run_gtr(self, monkeypatch, *results):
+        run_gtr = AsyncMock(side_effect=list(results))
+        monkeypatch.setattr(server, "_run_gtr", run_gtr)
+        return run_gtr
+
+    @staticmethod
+    def failure(stderr):
+        return {"success": False, "stdout": "", "stderr": stderr, "returncode": 2}
+
+    def test_accepted_skips_git_add(self, monkeypatch, run_git):
+        """A CLI that supports --add stages and commits in one call."""
+        run_gtr = self.fake_run_gtr(monkeypatch, self.OK)
+
+        asyncio.run(server.gitrama_stage_and_commit(files="src/a.py b.py"))
+
+        run_gtr.assert_awaited_once_with(
+            ["commit", "-y", "--add", "src/a.py", "--add", "b.py"]
+        )
+        run_git.assert_not_called()
+        assert server._GTR_COMMIT_ADD is True
+
+    def test_rejected_falls_back_to_two_steps(self, monkeypatch, run_git):
+        """A CLI without --add is remembered and the paths are staged by git."""
+        run_gtr = self.fake_run_gtr(
+            monkeypatch, self.failure("Error: No such option: --add"), self.OK
+        )
+
+        result = asyncio.run(server.gitrama_stage_and_commit(files="src/a.py"))
+
+        assert server._GTR_COMMIT_ADD is False
+        run_git.assert_awaited_once_with(["add", "--", "src/a.py"])
+        assert run_gtr.await_args_list[1].args[0] == server._COMMIT_DEFAULT
+        assert not result.startswith("❌")
+
+    def test_other_failure_not_retried(self, monkeypatch, run_git):
+        """Any other gtr error is reported as-is, without the two-step retry."""
+        self.fake_run_gtr(monkeypatch, self.failure("Error: nothing to commit"))
+
+        result = asyncio.run(server.gitrama_stage_and_commit())
+
+        assert result == "❌ Error: Error: nothing to commit"
+        assert server._GTR_COMMIT_ADD is True
+        run_git.assert_not_called()
+
+
+# ─── Working Directory Tests ──────────────────────────────────────────────────
+
+class TestGetCwd:
+    """Tests for the cached working-directory lookup."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_cwd_cache(self, monkeypatch):
+        monkeypatch.setattr(server, "_CACHED_CWD", None)
+        monkeypatch.setattr(server, "_CACHED_GTR_CWD", None)
+        monkeypatch.delenv("GTR_CWD", raising=False)
+
+    def test_re_resolves_when_gtr_cwd_changes(self, monkeypatch, tmp_path):
+        """Setting, changing or clearing GTR_CWD is picked up on the next call."""
+        monkeypatch.setenv("GTR_CWD", str(tmp_path / "a"))
+        assert server._get_cwd() == str(tmp_path / "a")
+        monkeypatch.setenv("GTR_CWD", str(tmp_path / "b"))
+        assert server._get_cwd() == str(tmp_path / "b")
+        monkeypatch.delenv("GTR_CWD")
+        assert server._get_cwd() == os.getcwd()
+
+    def test_getcwd_called_once(self, monkeypatch):
+        """Without GTR_CWD the process directory is looked up only once."""
+        calls = []
+
+        def fake_getcwd():
+            calls.append(1)
+            return "/srv/repo"
+
+        monkeypatch.setattr(server.os, "getcwd", fake_getcwd)
+        assert server._get_cwd() == "/srv/repo"
+        assert server._get_cwd() == "/srv/repo"
+        assert len(calls) == 1
+
+
+# ─── Commit Tests ─────────────────────────────────────────────────────────────
+
+class TestCommit:
+    """Tests for choosing between git and gtr in gitrama_commit."""
+
+    def test_message_commits_with_git(self, monkeypatch, temp_git_repo):
+        """A caller-supplied message is committed by git without running gtr."""
+        exec_gtr = AsyncMock()
+        monkeypatch.setattr(server, "_exec_gtr", exec_gtr)
+        monkeypatch.setenv("GTR_CWD", str(temp_git_repo))
+        (temp_git_repo / "notes.md").write_text("notes\n")
+        git(temp_git_repo, "add", "notes.md")
+
+        result = asyncio.run(server.gitrama_commit(message="docs: add notes"))
+
+        exec_gtr.assert_not_called()
+        assert not result.startswith("❌")
+        log = subprocess.run(
+            ["git", "log", "-1", "--format=%s"],
+            cwd=temp_git_repo,
+            capture_output=True,
+            text=True,
+        )
+        assert log.stdout.strip() == "docs: add notes"
+
+    def test_no_message_uses_gtr(self, monkeypatch, fake_gtr, tmp_path):
+        """Without a message the AI commit path runs `gtr commit -y`."""
+        run_git = AsyncMock()
+        monkeypatch.setattr(server, "_run_git", run_git)
+        monkeypatch.setenv("GTR_CWD", str(tmp_path))
+
+        asyncio.run(server.gitrama_commit())
+
+        assert fake_gtr == [("commit", "-y")]
+        run_git.assert_not_called()
+
+
+# ─── Entry Point Tests ────────────────────────────────────────────────────────
+
+class TestMain:
+    """Tests for transport selection in main()."""
+
+    @pytest.fixture
+    def stdin(self, monkeypatch):
+        stdin = Mock()
+        monkeypatch.setattr(server.sys, "stdin", stdin)
+        monkeypatch.setattr(server, "_warmup", Mock())
+        return stdin
+
+    def test_configured_transport_skips_tty_probe(self, monkeypatch, stdin):
+        """With GTR_MCP_TRANSPORT set, stdin is never asked whether it's a TTY."""
+        run = Mock()
+        monkeypatch.setattr(server.mcp, "run", run)
+        monkeypatch.setenv("GTR_MCP_TRANSPORT", "stdio")
+
+        server.main()
+
+        stdin.isatty.assert_not_called()
+        run.assert_called_once_with(transport="stdio")
+
+    def test_unset_transport_on_tty_shows_help(self, monkeypatch, stdin):
+        """A human running the server directly gets the help banner."""
+        monkeypatch.delenv("GTR_MCP_TRANSPORT", raising=False)
+        monkeypatch.setattr(server.sys, "stdout", Mock())
+        stdin.isatty.return_value = True
+
+        with pytest.raises(SystemExit) as exc:
+            server.main()
+
+        assert exc.value.code == 0
+        stdin.isatty.assert_called_once()
+
+
+# ─── Subprocess Timeout Tests ─────────────────────────────────────────────────
+
+class TestExecTimeout:
+    """Tests for what _exec does when a command outlives its timeout."""
+
+    def test_timed_out_process_killed_and_reaped(self, monkeypatch, tmp_path):
+        """A hung command is killed at the timeout and leaves no zombie behind."""
+        procs = []
+        spawn = asyncio.create_subprocess_exec
+
+        async def recording_spawn(*args, **kwargs):
+            proc = await spawn(*args, **kwargs)
+            procs.append(proc)
+            return proc
+
+        monkeypatch.setattr(server.asyncio, "create_subprocess_exec", recording_spawn)
+
+        start = time.monotonic()
+        result = asyncio.run(
+            server._exec(["sleep", "30"], str(tmp_path), 1, asyncio.Semaphore(1))
+        )
+        elapsed = time.monotonic() - start
+
+        assert elapsed < 5
+        assert result["success"] is False
+        assert "timed out after 1s" in result["stderr"]
+        (proc,) = procs
+        assert proc.returncode is not None
+        # Reaped: not even a zombie is left to signal.
+        with pytest.raises(ProcessLookupError):
+            os.kill(proc.pid, 0)
+
+
+# ─── Spawn Slot Tests ─────────────────────────────────────────────────────────
+
+class TestSpawnSlots:
+    """Tests for the caps on concurrently running subprocesses."""
+
+    def test_slot_wait_counts_against_timeout(self, tmp_path):
+        """A command queued behind a busy pool times out on its own deadline."""
+        async def run():
+            slots = asyncio.Semaphore(1)
+            busy = asyncio.ensure_future(
+                server._exec(["sleep", "2"], str(tmp_path), 10, slots)
+            )
+            await asyncio.sleep(0.1)
+            start = time.monotonic()
+            queued = await server._exec(["true"], str(tmp_path), 0.5, slots)
+            elapsed = time.monotonic() - start
+            return queued, elapsed, await busy
+
+        queued, elapsed, busy = asyncio.run(run())
+        assert elapsed < 1.5
+        assert queued["success"] is False
+        assert "timed out after 0.5s" in queued["stderr"]
+        assert busy["success"] is True
+
+    def test_git_not_blocked_by_busy_gtr_pool(self, monkeypatch, tmp_path):
+        """Plain git commands have their own pool and don't wait on gtr calls."""
+        async def run():
+            monkeypatch.setattr(server, "_spawn_slots", asyncio.Semaphore(1))
+            await server._spawn_slots.acquire()
+            return await server._run_git(("--version",), timeout=2, cwd=str(tmp_path))
+
+        result = asyncio.run(run())
+        assert result["success"] is True
+        assert result["stdout"].startswith("git version")
+
+
+# ─── gtr Daemon Tests ─────────────────────────────────────────────────────────
+
+# Stand-in for `gtr --mcp-daemon`: argv[1] is the handshake line to send,
+# argv[2] a file every received message is logged to. Replies echo the
+# request's args; ["die"] exits mid-request, ["hang"] never replies, and
+# ["pair", ...] requests are answered two at a time in reverse order.
+FAKE_DAEMON = r"""
+import json, sys
+print(sys.argv[1], flush=True)
+log = open(sys.argv[2], "a")
+pairs = []
+
+def reply(msg):
+    out = {"id": msg["id"], "returncode": 0, "stdout": " ".join(msg["args"])}
+    print(json.dumps(out), flush=True)
+
+for line in sys.stdin:
+    log.write(line)
+    log.flush()
+    msg = json.loads(line)
+    if msg.get("cancel"):
+        continue
+    args = msg["args"]
+    if args == ["die"]:
+        sys.exit(3)
+    if args == ["hang"]:
+        continue
+    if args[0] == "pair":
+        pairs.append(msg)
+        if len(pairs) == 2:
+            for m in reversed(pairs):
+                reply(m)
+            pairs.clear()
+        continue
+    reply(msg)
+"""
+
+
+class TestGtrDaemon:
+    """Tests for the persistent-daemon client, driven against FAKE_DAEMON."""
+
+    @pytest.fixture
+    def log(self, tmp_path):
+        return tmp_path / "daemon.log"
+
+    def daemon(self, log, handshake='{"ready": true}'):
+        daemon = server._GtrDaemon(
+            [sys.executable, "-c", FAKE_DAEMON, handshake, str(log)]
+        )
+        daemon.available = True
+        return daemon
+
+    @staticmethod
+    async def shutdown(daemon):
+        """Close the daemon's stdin and wait for the reader to reap it."""
+        if daemon.proc is not None and daemon.proc.returncode is None:
+            daemon.proc.stdin.close()
+        if daemon._reader is not None:
+            await daemon._reader
+
+    def test_reply_returned(self, log, tmp_path):
+        """A request goes out as JSON and its reply comes back as a result."""
+        async def run():
+            daemon = self.daemon(log)
+            result = await daemon.run(["status"], str(tmp_path), 5)
+            await self.shutdown(daemon)
+            return result
+
+        result = asyncio.run(run())
+        assert result == {
+            "success": True,
+            "stdout": "status",
+            "stderr": "",
+            "returncode": 0,
+        }
+        sent = json.loads(log.read_text())
+        assert sent == {"id": 1, "args": ["status"], "cwd": str(tmp_path)}
+
+    def test_bad_handshake_falls_back_to_spawning(self, monkeypatch, log, tmp_path):
+        """If the daemon doesn't say it's ready, gtr is spawned instead."""
+        exec_gtr = AsyncMock(
+            return_value={"success": True, "stdout": "", "stderr": "", "returncode": 0}
+        )
+        monkeypatch.setattr(server, "_exec_gtr", exec_gtr)
+
+        async def run():
+            daemon = self.daemon(log, handshake="Usage: gtr [OPTIONS] COMMAND")
+            monkeypatch.setattr(server, "_daemon", daemon)
+            result = await server._run_gtr(("branch", "x"), cwd=str(tmp_path))
+            return daemon, result
+
+        daemon, result = asyncio.run(run())
+        assert result["success"] is True
+        exec_gtr.assert_awaited_once()
+        assert daemon.available is False
+        assert daemon.proc is None
+        assert not log.exists() or log.read_text() == ""
+
+    def test_crash_after_send_is_not_rerun(self, monkeypatch, log, tmp_path):
+        """A daemon that dies after receiving a command yields an error, not a retry."""
+        exec_gtr = AsyncMock()
+        monkeypatch.setattr(server, "_exec_gtr", exec_gtr)
+
+        async def run():
+            daemon = self.daemon(log)
+            monkeypatch.setattr(server, "_daemon", daemon)
+            result = await server._run_gtr(("die",), cwd=str(tmp_path))
+            await daemon._reader
+            return daemon, result
+
+        daemon, result = asyncio.run(run())
+        exec_gtr.assert_not_called()
+        assert result["success"] is False
+        assert "may or may not have run" in result["stderr"]
+        assert daemon.available is False
+        # The reader reaped the process once it hit EOF.
+        assert daemon.proc.returncode == 3
+
+    def test_interleaved_replies_routed_by_id(self, log, tmp_path):
+        """Out-of-order replies reach the caller whose request they answer."""
+        async def run():
+            daemon = self.daemon(log)
+            assert await daemon._start()
+            results = await asyncio.gather(
+                daemon.run(["pair", "first"], str(tmp_path), 5),
+                daemon.run(["pair", "second"], str(tmp_path), 5),
+            )
+            await self.shutdown(daemon)
+            return results
+
+        first, second = asyncio.run(run())
+        assert first["stdout"] == "pair first"
+        assert second["stdout"] == "pair second"
+
+    def test_timeout_sends_cancel(self, log, tmp_path):
+        """A request that times out is cancelled on the daemon side."""
+        async def run():
+            daemon = self.daemon(log)
+            result = await daemon.run(["hang"], str(tmp_path), 0.3)
+            await daemon.proc.stdin.drain()
+            await self.shutdown(daemon)
+            return result
+
+        result = asyncio.run(run())
+        assert result["success"] is False
+        assert "timed out after 0.3s: gtr hang" in result["stderr"]
+        sent = [json.loads(line) for line in log.read_text().splitlines()]
+        assert sent[-1] == {"id": 1, "cancel": True}